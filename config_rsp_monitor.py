@@ -2,28 +2,236 @@
 # -*- coding: utf-8 -*-
 
 import os
-import subprocess
-import sys
+import asyncio
+import importlib
+import multiprocessing
+import signal
 from datetime import datetime
+import atexit
+import queue
 import logging
+import logging.handlers
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('rsp_config.log'),
-        logging.StreamHandler()
-    ]
-)
+_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 logger = logging.getLogger(__name__)
 
+def _setup_logging():
+    """配置日志（只在主进程中调用，spawn启动的子进程导入本模块时不会执行）"""
+    # 调用方只把日志记录放入队列，格式化和文件/控制台写入由后台线程完成
+    # 文件日志先缓存在内存中批量写入，遇到ERROR级别立即刷新
+    formatter = logging.Formatter(_LOG_FORMAT)
+    file_handler = logging.FileHandler('rsp_config.log')
+    file_handler.setFormatter(formatter)
+    buffered_file_handler = logging.handlers.MemoryHandler(
+        capacity=512,
+        flushLevel=logging.ERROR,
+        target=file_handler
+    )
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(
+        log_queue,
+        buffered_file_handler,
+        stream_handler,
+        respect_handler_level=True
+    )
+    logging.root.setLevel(logging.INFO)
+    logging.root.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener.start()
+    # 退出时先停止监听线程（处理完队列中剩余的记录），再刷新文件缓存
+    atexit.register(buffered_file_handler.close)
+    atexit.register(log_listener.stop)
+
+# 菜单及说明文本预先拼接好，每次只需一次输出
+_MENU = """\
+🎯 RSP ETF定投监控系统配置
+==================================================
+📊 基于GitHub Actions的云端部署方案
+==================================================
+1. 立即运行一次监控
+2. 运行回测分析
+3. 查看回测结果摘要
+4. GitHub Actions部署指导
+5. 环境配置指导
+6. 退出
+"""
+
+_BACKTEST_SUMMARY = """\
+📊 RSP监控系统回测结果摘要
+============================================================
+📅 回测期间: 2024年8月-2025年5月 (10个月)
+⏰ 执行方式: 每日21:00检查前一交易日数据
+
+🎯 触发统计:
+   第一笔定投触发: 6次 (60%)
+   到期提醒触发: 4次 (40%)
+   第二笔定投触发: 3次 (30%)
+   第三笔定投触发: 1次 (10%)
+
+💡 关键发现:
+   • 总触发次数: 14次
+   • 平均每月触发: 1.4次
+   • 触发覆盖率: 250% (所有下跌月份都有触发)
+   • 最大月度跌幅: 11.60% (2025年4月)
+
+📈 市场表现:
+   • 平均月收益: +0.52%
+   • 最好月份: +6.04% (2024年11月)
+   • 最差月份: -6.64% (2024年12月)
+
+✅ 策略验证: 监控系统能有效捕获市场下跌机会
+"""
+
+_GITHUB_ACTIONS_SETUP = """\
+🚀 GitHub Actions 部署指导
+============================================================
+
+📁 项目结构:
+   your-repo/
+   ├── .github/workflows/
+   │   └── rsp_monitor.yml
+   ├── rsp_dca_monitor.py
+   ├── market_breadth_fetcher.py
+   ├── requirements.txt
+   └── README.md
+
+🔑 需要设置的GitHub Secrets:
+   • LONGPORT_APP_KEY
+   • LONGPORT_APP_SECRET
+   • LONGPORT_ACCESS_TOKEN
+   • SCKEY (Server酱密钥)
+
+⏰ 执行计划:
+   • 每日21:00 UTC+8 (北京时间)
+   • 仅工作日执行 (周一至周五)
+   • 基于前一交易日数据进行监控
+
+📝 设置步骤:
+   1. 将代码推送到GitHub仓库
+   2. 在仓库Settings > Secrets中添加密钥
+   3. GitHub Actions会自动开始监控
+   4. 查看Actions页面确认运行状态
+
+🔗 相关链接:
+   • GitHub Actions文档: https://docs.github.com/actions
+   • Server酱注册: https://sct.ftqq.com/
+"""
+
+_ENVIRONMENT_SETUP = """\
+🔧 环境配置指导
+==================================================
+1. 长桥API配置:
+   - LONGPORT_APP_KEY=你的app_key
+   - LONGPORT_APP_SECRET=你的app_secret
+   - LONGPORT_ACCESS_TOKEN=你的access_token
+
+2. Server酱配置:
+   - SCKEY=你的server酱密钥
+
+3. 获取长桥API密钥:
+   - 访问: https://open.longportapp.com/
+   - 注册开发者账号并创建应用
+   - 获取API密钥
+
+4. 获取Server酱密钥:
+   - 访问: https://sct.ftqq.com/
+   - 登录并获取SendKey
+
+📝 本地测试环境变量设置:
+   Windows: set SCKEY=你的密钥
+   Linux/Mac: export SCKEY=你的密钥
+
+☁️ GitHub Actions环境变量:
+   在仓库Settings > Secrets中设置以上所有变量
+"""
+
+def _worker_loop(conn, module_name: str):
+    """脚本进程主循环：预先导入脚本及其依赖，然后逐个执行父进程发来的任务"""
+    # Ctrl+C由父进程处理，父进程退出时会结束本进程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    importlib.import_module(module_name)
+    while True:
+        try:
+            func = conn.recv()
+        except EOFError:
+            break
+        try:
+            func()
+            conn.send((True, None))
+        except BaseException as e:
+            conn.send((False, repr(e)))
+
+class _ScriptWorker:
+    """常驻的脚本执行进程：后续任务无需重新导入依赖，任务超时时直接结束整个进程"""
+    
+    def __init__(self, module_name: str):
+        # 使用spawn启动：父进程中有日志监听等后台线程，fork出的子进程可能继承到被占用的锁
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_worker_loop, args=(child_conn, module_name), daemon=True)
+        self._process.start()
+        child_conn.close()
+    
+    def run(self, func, timeout: float):
+        """在子进程中执行func；超时抛出TimeoutError，任务出错抛出RuntimeError，进程退出抛出EOFError"""
+        self._conn.send(func)
+        if not self._conn.poll(timeout):
+            raise TimeoutError(f"执行超过{timeout}秒")
+        ok, error = self._conn.recv()
+        if not ok:
+            raise RuntimeError(error)
+    
+    def close(self):
+        """结束子进程，正在执行的任务一并终止"""
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join()
+        self._conn.close()
+
+def _run_monitor_main():
+    """在监控进程中执行一次监控（用户手动触发，当日已检查过也重新检查）"""
+    import rsp_dca_monitor
+    asyncio.run(rsp_dca_monitor.main(['--force']))
+
+def _run_backtest_main():
+    """在回测进程中执行回测"""
+    import rsp_backtest_monitor
+    asyncio.run(rsp_backtest_monitor.main())
+
 class RSPConfig:
     """RSP监控配置管理器"""
     
     def __init__(self):
         self.script_path = 'rsp_dca_monitor.py'
+        # 常驻的脚本进程（按模块名），首次运行时创建，后续运行无需重新导入依赖
+        self._workers = {}
+    
+    def _run_in_worker(self, module_name: str, func, timeout: float, task_name: str) -> bool:
+        """在常驻的脚本进程中执行任务；超时或进程异常退出时结束该进程，下次重新创建"""
+        worker = self._workers.get(module_name)
+        if worker is None:
+            worker = _ScriptWorker(module_name)
+            self._workers[module_name] = worker
+            atexit.register(worker.close)
+        
+        try:
+            worker.run(func, timeout)
+            return True
+        except RuntimeError as e:
+            # 任务本身出错，进程仍可继续使用
+            logger.error("%s执行失败: %s", task_name, e)
+            return False
+        except TimeoutError:
+            logger.error("%s执行超时", task_name)
+        except (EOFError, OSError) as e:
+            logger.error("%s进程异常退出: %s", task_name, e)
         
+        worker.close()
+        del self._workers[module_name]
+        return False
+    
     def run_monitor_once(self):
         """运行一次RSP监控脚本"""
         try:
@@ -31,31 +239,18 @@ class RSPConfig:
             
             # 检查脚本文件是否存在
             if not os.path.exists(self.script_path):
-                logger.error(f"监控脚本不存在: {self.script_path}")
+                logger.error("监控脚本不存在: %s", self.script_path)
                 return False
             
-            # 执行监控脚本
-            result = subprocess.run(
-                [sys.executable, self.script_path],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5分钟超时
-            )
-            
-            if result.returncode == 0:
-                logger.info("RSP监控任务执行成功")
-                if result.stdout:
-                    print(result.stdout)
-                return True
-            else:
-                logger.error(f"RSP监控任务执行失败: {result.stderr}")
+            # 在常驻的监控进程中执行，省去重复导入依赖的开销；超时5分钟时结束该进程
+            if not self._run_in_worker('rsp_dca_monitor', _run_monitor_main, 300, "RSP监控任务"):
                 return False
+            
+            logger.info("RSP监控任务执行成功")
+            return True
                 
-        except subprocess.TimeoutExpired:
-            logger.error("RSP监控任务执行超时")
-            return False
         except Exception as e:
-            logger.error(f"执行RSP监控任务异常: {e}")
+            logger.error("执行RSP监控任务异常: %s", e)
             return False
     
     def run_backtest(self):
@@ -65,133 +260,35 @@ class RSPConfig:
             
             backtest_script = 'rsp_backtest_monitor.py'
             if not os.path.exists(backtest_script):
-                logger.error(f"回测脚本不存在: {backtest_script}")
+                logger.error("回测脚本不存在: %s", backtest_script)
                 return False
             
-            result = subprocess.run(
-                [sys.executable, backtest_script],
-                capture_output=True,
-                text=True,
-                timeout=600  # 10分钟超时
-            )
-            
-            if result.returncode == 0:
-                logger.info("RSP回测执行成功")
-                if result.stdout:
-                    print(result.stdout)
-                return True
-            else:
-                logger.error(f"RSP回测执行失败: {result.stderr}")
+            # 在常驻的独立进程中执行回测，既隔离又免去每次的导入开销
+            if not self._run_in_worker('rsp_backtest_monitor', _run_backtest_main, 600, "RSP回测"):  # 10分钟超时
                 return False
+            
+            logger.info("RSP回测执行成功")
+            return True
                 
-        except subprocess.TimeoutExpired:
-            logger.error("RSP回测执行超时")
-            return False
         except Exception as e:
-            logger.error(f"执行RSP回测异常: {e}")
+            logger.error("执行RSP回测异常: %s", e)
             return False
 
 def show_backtest_summary():
     """显示回测结果摘要"""
-    print("📊 RSP监控系统回测结果摘要")
-    print("=" * 60)
-    print("📅 回测期间: 2024年8月-2025年5月 (10个月)")
-    print("⏰ 执行方式: 每日21:00检查前一交易日数据")
-    print()
-    print("🎯 触发统计:")
-    print("   第一笔定投触发: 6次 (60%)")
-    print("   到期提醒触发: 4次 (40%)")
-    print("   第二笔定投触发: 3次 (30%)")
-    print("   第三笔定投触发: 1次 (10%)")
-    print()
-    print("💡 关键发现:")
-    print("   • 总触发次数: 14次")
-    print("   • 平均每月触发: 1.4次")
-    print("   • 触发覆盖率: 250% (所有下跌月份都有触发)")
-    print("   • 最大月度跌幅: 11.60% (2025年4月)")
-    print()
-    print("📈 市场表现:")
-    print("   • 平均月收益: +0.52%")
-    print("   • 最好月份: +6.04% (2024年11月)")
-    print("   • 最差月份: -6.64% (2024年12月)")
-    print()
-    print("✅ 策略验证: 监控系统能有效捕获市场下跌机会")
+    print(_BACKTEST_SUMMARY, end='')
 
 def show_github_actions_setup():
     """显示GitHub Actions设置指导"""
-    print("🚀 GitHub Actions 部署指导")
-    print("=" * 60)
-    print()
-    print("📁 项目结构:")
-    print("   your-repo/")
-    print("   ├── .github/workflows/")
-    print("   │   └── rsp_monitor.yml")
-    print("   ├── rsp_dca_monitor.py")
-    print("   ├── market_breadth_fetcher.py")
-    print("   ├── requirements.txt")
-    print("   └── README.md")
-    print()
-    print("🔑 需要设置的GitHub Secrets:")
-    print("   • LONGPORT_APP_KEY")
-    print("   • LONGPORT_APP_SECRET")
-    print("   • LONGPORT_ACCESS_TOKEN") 
-    print("   • SCKEY (Server酱密钥)")
-    print()
-    print("⏰ 执行计划:")
-    print("   • 每日21:00 UTC+8 (北京时间)")
-    print("   • 仅工作日执行 (周一至周五)")
-    print("   • 基于前一交易日数据进行监控")
-    print()
-    print("📝 设置步骤:")
-    print("   1. 将代码推送到GitHub仓库")
-    print("   2. 在仓库Settings > Secrets中添加密钥")
-    print("   3. GitHub Actions会自动开始监控")
-    print("   4. 查看Actions页面确认运行状态")
-    print()
-    print("🔗 相关链接:")
-    print("   • GitHub Actions文档: https://docs.github.com/actions")
-    print("   • Server酱注册: https://sct.ftqq.com/")
+    print(_GITHUB_ACTIONS_SETUP, end='')
 
 def setup_environment():
     """设置环境变量指导"""
-    print("🔧 环境配置指导")
-    print("=" * 50)
-    print("1. 长桥API配置:")
-    print("   - LONGPORT_APP_KEY=你的app_key")
-    print("   - LONGPORT_APP_SECRET=你的app_secret")
-    print("   - LONGPORT_ACCESS_TOKEN=你的access_token")
-    print()
-    print("2. Server酱配置:")
-    print("   - SCKEY=你的server酱密钥")
-    print()
-    print("3. 获取长桥API密钥:")
-    print("   - 访问: https://open.longportapp.com/")
-    print("   - 注册开发者账号并创建应用")
-    print("   - 获取API密钥")
-    print()
-    print("4. 获取Server酱密钥:")
-    print("   - 访问: https://sct.ftqq.com/")
-    print("   - 登录并获取SendKey")
-    print()
-    print("📝 本地测试环境变量设置:")
-    print("   Windows: set SCKEY=你的密钥")
-    print("   Linux/Mac: export SCKEY=你的密钥")
-    print()
-    print("☁️ GitHub Actions环境变量:")
-    print("   在仓库Settings > Secrets中设置以上所有变量")
+    print(_ENVIRONMENT_SETUP, end='')
 
 def main():
     """主菜单"""
-    print("🎯 RSP ETF定投监控系统配置")
-    print("=" * 50)
-    print("📊 基于GitHub Actions的云端部署方案")
-    print("=" * 50)
-    print("1. 立即运行一次监控")
-    print("2. 运行回测分析")
-    print("3. 查看回测结果摘要") 
-    print("4. GitHub Actions部署指导")
-    print("5. 环境配置指导")
-    print("6. 退出")
+    print(_MENU, end='')
     
     config = RSPConfig()
     
@@ -238,4 +335,5 @@ def main():
             print(f"❌ 错误: {e}")
 
 if __name__ == "__main__":
+    _setup_logging()
     main() 
\ No newline at end of file
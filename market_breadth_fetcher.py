@@ -1,34 +1,83 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import requests
 import logging
-from bs4 import BeautifulSoup
 import re
 import json
-from typing import Optional
+from typing import Optional, Tuple
 import time
+import queue
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# 优先使用C实现的lxml解析器，未安装时回退到纯Python的html.parser
+try:
+    import lxml
+    _HTML_PARSER = 'lxml'
+except ImportError:
+    _HTML_PARSER = 'html.parser'
+
+# 安装了brotli解码器时声明支持br压缩（requests/urllib3会自动解压）
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+_ACCEPT_ENCODING = 'gzip, br, deflate' if brotli else 'gzip, deflate'
+
+# JSON解析优先使用orjson，未安装时回退到标准库json
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# 预编译的正则表达式
+_PERCENT_CAPTURE_RE = re.compile(r'(\d+(?:\.\d+)?)%')
+_ADV_DECL_RE = re.compile(r'"advanceDecline":\s*(\d+(?:\.\d+)?)')
+
+# 流式解析时每块的大小
+_STREAM_CHUNK_SIZE = 16384
+
 class MarketBreadthFetcher:
     """市场宽度数据获取器"""
     
+    # 同一主机两次请求之间的最小间隔（秒）
+    MIN_REQUEST_INTERVAL = 2.0
+    
+    # 当日市场宽度缓存: (日期, 数值)，进程内所有实例共享，同一天内重复调用不再发起请求
+    _cache: Optional[Tuple[str, float]] = None
+    
     def __init__(self):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
+            'Accept-Encoding': _ACCEPT_ENCODING,
             'Connection': 'keep-alive',
         }
         
+        # HTTP会话在首次请求时创建，避免仅导入模块时就加载requests
+        self.session = None
+        self._session_lock = threading.Lock()
+        
+        # 各主机最近一次请求时间，仅在短时间内重复访问同一主机时才等待
+        self._last_hit = {}
+        self._last_hit_lock = threading.Lock()
+        
         # 备用数据源
         self.data_sources = [
             {
                 'name': 'TheMarketMemo',
                 'url': 'https://themarketmemo.com/marketbreadth/',
-                'parser': self._parse_market_memo
+                'parser': self._parse_market_memo,
+                # 可边下载边解析：只扫描新到达的内容
+                'incremental': self._find_market_memo
             },
             {
                 'name': 'TradingView',
@@ -40,113 +89,246 @@ class MarketBreadthFetcher:
     def _parse_market_memo(self, html_content: str) -> Optional[float]:
         """解析TheMarketMemo网站的市场宽度数据"""
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # 查找包含百分比的元素
-            # 这里需要根据实际网页结构调整选择器
-            breadth_elements = soup.find_all(text=re.compile(r'\d+(\.\d+)?%'))
-            
-            for element in breadth_elements:
-                # 查找疑似市场宽度的数值
-                match = re.search(r'(\d+(?:\.\d+)?)%', str(element))
-                if match:
-                    value = float(match.group(1))
-                    # 市场宽度通常在0-100%之间
-                    if 0 <= value <= 100:
-                        logger.info(f"从TheMarketMemo获取市场宽度: {value}%")
-                        return value
-            
-            return None
-            
+            return self._find_market_memo(html_content)
         except Exception as e:
-            logger.error(f"解析TheMarketMemo数据失败: {e}")
+            logger.error("解析TheMarketMemo数据失败: %s", e)
             return None
     
+    def _find_market_memo(self, html_content: str, pos: int = 0, min_end: int = 0) -> Optional[float]:
+        """从pos开始查找第一个有效的市场宽度百分比，只考虑结束位置在min_end之后的匹配"""
+        # 直接在原始HTML上查找百分比，无需构建DOM
+        # 这里需要根据实际网页结构调整匹配规则
+        for match in _PERCENT_CAPTURE_RE.finditer(html_content, pos):
+            if match.end() <= min_end:
+                continue
+            start = match.start()
+            # 跳过标签属性中的百分比（如 width="100%"），只保留文本内容
+            if html_content.rfind('<', 0, start) > html_content.rfind('>', 0, start):
+                continue
+            
+            value = float(match.group(1))
+            # 市场宽度通常在0-100%之间
+            if 0 <= value <= 100:
+                logger.info("从TheMarketMemo获取市场宽度: %s%%", value)
+                return value
+        
+        return None
+    
     def _parse_tradingview(self, html_content: str) -> Optional[float]:
         """解析TradingView的市场宽度数据"""
         try:
+            # 页面中根本不存在目标字段时无需解析HTML
+            if 'advanceDecline' not in html_content:
+                return None
+            
+            from bs4 import BeautifulSoup, SoupStrainer
+            
             # TradingView通常使用JavaScript动态加载数据
             # 这里提供一个基础解析示例
-            soup = BeautifulSoup(html_content, 'html.parser')
+            # 只构建script标签，跳过页面其余部分的DOM
+            soup = BeautifulSoup(html_content, _HTML_PARSER, parse_only=SoupStrainer('script'))
             
             # 查找可能包含市场宽度数据的脚本标签
             scripts = soup.find_all('script')
             for script in scripts:
-                if script.string and 'advance' in script.string.lower():
+                content = script.string
+                if content and 'advanceDecline' in content:
                     # 尝试从JavaScript中提取数据
-                    content = script.string
-                    # 这里需要根据实际情况调整正则表达式
-                    match = re.search(r'"advanceDecline":\s*(\d+(?:\.\d+)?)', content)
-                    if match:
-                        value = float(match.group(1))
-                        logger.info(f"从TradingView获取市场宽度: {value}%")
+                    value = self._extract_advance_decline(content)
+                    if value is not None:
+                        logger.info("从TradingView获取市场宽度: %s%%", value)
                         return value
+                    
+                    # 脚本内容可能很大，仅在DEBUG级别启用时才截取预览
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("TradingView脚本未匹配到advanceDecline: %s", content[:500])
             
             return None
             
         except Exception as e:
-            logger.error(f"解析TradingView数据失败: {e}")
+            logger.error("解析TradingView数据失败: %s", e)
             return None
     
-    def get_market_breadth_from_source(self, source: dict) -> Optional[float]:
-        """从指定数据源获取市场宽度"""
+    def _extract_advance_decline(self, content: str) -> Optional[float]:
+        """从脚本内容中提取advanceDecline数值"""
+        # 脚本内嵌JSON数据（如 window.__INITIAL_STATE__ = {...}）时直接解析后查字典
+        start = content.find('{')
+        end = content.rfind('}') + 1
+        if 0 <= start < end:
+            try:
+                data = _json_loads(content[start:end])
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                value = data.get('advanceDecline')
+                if isinstance(value, (int, float)):
+                    return float(value)
+        
+        # 回退到正则匹配，这里需要根据实际情况调整正则表达式
+        match = _ADV_DECL_RE.search(content)
+        if match:
+            return float(match.group(1))
+        return None
+    
+    def _get_session(self):
+        """获取HTTP会话，首次调用时创建"""
+        with self._session_lock:
+            if self.session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                
+                # 复用连接（keep-alive + 连接池），避免每次请求重新握手
+                # 网关类错误自动重试，重试时同样复用已建立的连接
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=8,
+                    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.headers.update(self.headers)
+                self.session = session
+            return self.session
+    
+    def _wait_for_host(self, url: str):
+        """控制对同一主机的请求频率"""
+        host = urlparse(url).netloc
+        with self._last_hit_lock:
+            now = time.monotonic()
+            last = self._last_hit.get(host)
+            wait = 0.0 if last is None else last + self.MIN_REQUEST_INTERVAL - now
+            # 预先占用本次请求的时间点，再在锁外等待
+            self._last_hit[host] = now + max(wait, 0.0)
+        
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _parse_streaming(self, response, finder, stop: Optional[threading.Event] = None) -> Optional[float]:
+        """边下载边解析，找到结果或stop被设置后立即停止读取剩余内容"""
+        # 保留完整的已下载内容，标签判断始终基于完整上下文；
+        # 每次只扫描可能延伸到新内容的匹配：从旧内容末尾所在数字串的起点开始，
+        # 并只接受结束位置超过旧内容末尾的匹配（其余匹配此前已判断过）
+        buffer = ''
+        for chunk in response.iter_content(chunk_size=_STREAM_CHUNK_SIZE, decode_unicode=True):
+            if stop is not None and stop.is_set():
+                return None
+            scanned = len(buffer)
+            buffer += chunk
+            pos = scanned
+            while pos > 0 and (buffer[pos - 1].isdigit() or buffer[pos - 1] == '.'):
+                pos -= 1
+            value = finder(buffer, pos, scanned)
+            if value is not None:
+                return value
+        
+        return None
+    
+    def _read_text(self, response, stop: Optional[threading.Event] = None) -> Optional[str]:
+        """分块读取完整响应内容，stop被设置时放弃读取并返回None"""
+        chunks = []
+        for chunk in response.iter_content(chunk_size=_STREAM_CHUNK_SIZE, decode_unicode=True):
+            if stop is not None and stop.is_set():
+                return None
+            chunks.append(chunk)
+        return ''.join(chunks)
+    
+    def get_market_breadth_from_source(self, source: dict,
+                                       stop: Optional[threading.Event] = None) -> Optional[float]:
+        """从指定数据源获取市场宽度（stop被设置时尽快放弃，用于并发请求中已有结果的情况）"""
+        import requests
+        
         try:
-            logger.info(f"尝试从{source['name']}获取市场宽度数据")
-            
-            response = requests.get(
-                source['url'], 
-                headers=self.headers, 
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                return source['parser'](response.text)
-            else:
-                logger.warning(f"{source['name']}请求失败: {response.status_code}")
+            logger.info("尝试从%s获取市场宽度数据", source['name'])
+            session = self._get_session()
+            self._wait_for_host(source['url'])
+            if stop is not None and stop.is_set():
                 return None
+            
+            with session.get(source['url'], timeout=15, stream=True) as response:
+                if response.status_code != 200:
+                    logger.warning("%s请求失败: %s", source['name'], response.status_code)
+                    return None
+                
+                # 两个数据源均为UTF-8页面，固定编码以跳过字符集自动检测
+                response.encoding = 'utf-8'
+                if source.get('incremental'):
+                    return self._parse_streaming(response, source['incremental'], stop)
+                # 退出with时关闭连接，未读完的内容直接丢弃
+                html_content = self._read_text(response, stop)
+                if html_content is None:
+                    return None
+                return source['parser'](html_content)
                 
         except requests.RequestException as e:
-            logger.warning(f"请求{source['name']}失败: {e}")
+            logger.warning("请求%s失败: %s", source['name'], e)
             return None
         except Exception as e:
-            logger.error(f"从{source['name']}获取数据异常: {e}")
+            logger.error("从%s获取数据异常: %s", source['name'], e)
             return None
     
-    def get_market_breadth(self) -> float:
-        """获取市场宽度数据（尝试多个数据源）"""
+    def get_market_breadth(self, simulate_on_failure: bool = True) -> Optional[float]:
+        """获取市场宽度数据（尝试多个数据源）
+        
+        所有数据源都失败时返回模拟数据；simulate_on_failure为False时返回None，
+        供调用方区分真实数据与模拟数据
+        """
         try:
-            # 依次尝试各个数据源
+            # 市场宽度为日度数据，当日已获取过则直接返回
+            now = datetime.now()
+            today = now.strftime('%Y%m%d')
+            if self._cache and self._cache[0] == today:
+                return self._cache[1]
+            
+            # 周末没有新的市场宽度数据，沿用最近一次获取的数值
+            if now.weekday() >= 5 and self._cache:
+                logger.info("非交易日，沿用%s的市场宽度数据", self._cache[0])
+                return self._cache[1]
+            
+            # 并发请求各个数据源，返回最先获取到的有效结果
+            # 各数据源位于不同主机，无需在请求之间等待
+            # 拿到结果后通过stop通知其余请求停止读取并关闭连接
+            stop = threading.Event()
+            results = queue.Queue()
             for source in self.data_sources:
-                breadth = self.get_market_breadth_from_source(source)
-                if breadth is not None:
-                    return breadth
-                
-                # 在数据源之间等待，避免请求过快
-                time.sleep(2)
+                # 使用守护线程：仍在等待响应头的请求无法中途停止，
+                # 放弃后不能让它拖住进程退出
+                threading.Thread(
+                    target=lambda src=source: results.put(self.get_market_breadth_from_source(src, stop)),
+                    daemon=True
+                ).start()
+            try:
+                for _ in self.data_sources:
+                    breadth = results.get()
+                    if breadth is not None:
+                        type(self)._cache = (today, breadth)
+                        return breadth
+            finally:
+                # 已拿到结果时不等待其余较慢的数据源，正在下载的请求读完当前块即退出
+                stop.set()
             
             # 如果所有数据源都失败，返回模拟数据
-            logger.warning("所有市场宽度数据源都不可用，使用模拟数据")
-            return self._get_simulated_breadth()
+            logger.warning("所有市场宽度数据源都不可用")
             
         except Exception as e:
-            logger.error(f"获取市场宽度数据失败: {e}")
-            return self._get_simulated_breadth()
+            logger.error("获取市场宽度数据失败: %s", e)
+        
+        return self._get_simulated_breadth() if simulate_on_failure else None
     
     def _get_simulated_breadth(self) -> float:
         """获取模拟的市场宽度数据"""
-        import random
-        from datetime import datetime
-        
-        # 基于当前时间生成伪随机但相对稳定的数据
-        seed = int(datetime.now().strftime('%Y%m%d')) % 1000
-        random.seed(seed)
+        # 基于当前日期生成伪随机但相对稳定的数据
+        # 直接对日期做乘法哈希映射到[0, 1]，不重置全局随机数生成器
+        seed = int(datetime.now().strftime('%Y%m%d'))
+        unit = ((seed * 2654435761) & 0xFFFFFFFF) / 0xFFFFFFFF
         
         # 模拟市场宽度在10-40%之间波动
         base_breadth = 25.0
-        variation = random.uniform(-10, 10)
+        variation = unit * 20 - 10
         breadth = max(5.0, min(45.0, base_breadth + variation))
         
-        logger.info(f"使用模拟市场宽度数据: {breadth:.1f}%")
+        logger.info("使用模拟市场宽度数据: %.1f%%", breadth)
         return breadth
     
     def validate_breadth_value(self, breadth: float) -> bool:
@@ -1,40 +1,94 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import os
 import sys
 import json
+import math
 import asyncio
 import logging
-from datetime import datetime, timedelta, date
+from datetime import timedelta, date
 from pathlib import Path
 import pandas as pd
 import numpy as np
 from longport.openapi import Config, QuoteContext, Period, AdjustType
-import matplotlib.pyplot as plt
+from rsp_numba import njit
 import warnings
 warnings.filterwarnings('ignore')
 
+# JSON输出优先使用orjson，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # 配置日志
+_file_handler = logging.FileHandler('rsp_backtest.log')
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('rsp_backtest.log'),
+        _file_handler,
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger(__name__)
 
+# 回测报告已直接写到终端，只需另外记入日志文件
+report_logger = logging.getLogger(f'{__name__}.report')
+report_logger.addHandler(_file_handler)
+report_logger.propagate = False
+
+@njit(cache=True)
+def _scan_month(rets, cum_decl, third_friday_idx, breadths,
+                dip_threshold=0.01, cum_threshold=0.05, breadth_threshold=15.0):
+    """逐日扫描单月触发条件，返回各条件的触发日序号（未触发为-1）"""
+    first_idx = -1
+    deadline_idx = -1
+    second_idx = -1
+    third_idx = -1
+    
+    for i in range(len(rets)):
+        # 条件1: 每月第一次日跌幅≥1%
+        # 条件2: 第三个周五到期提醒
+        if first_idx < 0 and deadline_idx < 0:
+            if rets[i] <= -dip_threshold:
+                first_idx = i
+            elif i == third_friday_idx:
+                deadline_idx = i
+        
+        # 条件3: 累计跌幅≥5%
+        if second_idx < 0 and cum_decl[i] >= cum_threshold:
+            second_idx = i
+        
+        # 条件4: 市场宽度<15%（在第二笔触发后）
+        if second_idx >= 0 and third_idx < 0 and breadths[i] < breadth_threshold:
+            third_idx = i
+    
+    return first_idx, deadline_idx, second_idx, third_idx
+
 class RSPBacktestMonitor:
     """RSP ETF定投监控系统 - 回测版本"""
     
+    # 多个回测实例共享同一个行情连接，避免重复鉴权握手；
+    # 回测由菜单按需连续触发，连接随常驻回测进程保留（进程超时被结束时一并释放），
+    # 而每日监控一天只运行一次，每次检查后即释放连接
+    _shared_ctx = None
+    
     def __init__(self):
         self.symbol = 'RSP.US'  # 标普500等权ETF
         self.quote_ctx = None
         
-        # 回测结果存储
-        self.backtest_results = []
+        # 回测结果存储（按列存放：月度指标与触发记录各自一组平行列表，
+        # 列名即CSV输出列名，触发记录按月份顺序追加）
+        self.months = {
+            'month': [], 'month_start_price': [], 'month_end_price': [],
+            'month_return': [], 'max_decline': [], 'trading_days': [], 'total_triggers': []
+        }
+        self.triggers = {
+            'month': [], 'trigger_date': [], 'trigger_type': [], 'trigger_condition': [],
+            'trigger_daily_return': [], 'trigger_price': [],
+            'trigger_cumulative_decline': [], 'trigger_market_breadth': []
+        }
         self.trigger_summary = {
             'first_dip_triggered': 0,
             'monthly_deadline_triggered': 0,
@@ -46,8 +100,9 @@ class RSPBacktestMonitor:
     async def initialize(self):
         """初始化长桥API"""
         try:
-            config = Config.from_env()
-            self.quote_ctx = QuoteContext(config)
+            if type(self)._shared_ctx is None:
+                type(self)._shared_ctx = QuoteContext(Config.from_env())
+            self.quote_ctx = type(self)._shared_ctx
             logger.info("成功初始化RSP回测系统")
             return True
         except Exception as e:
@@ -55,60 +110,50 @@ class RSPBacktestMonitor:
             return False
     
     async def get_historical_data(self, days: int = 400) -> pd.DataFrame:
-        """获取历史数据"""
+        """获取历史数据（days为自然日天数）"""
         try:
-            all_data = []
+            # count按K线根数计算，一年约252个交易日，将自然日换算为交易日
+            count = math.ceil(days * 252 / 365)
+            # candlesticks没有偏移参数，分批请求只会重复拿到同一段最新数据，
+            # 因此一次请求全部K线；放到线程中执行，避免阻塞事件循环
+            klines = await asyncio.to_thread(
+                self.quote_ctx.candlesticks,
+                symbol=self.symbol,
+                period=Period.Day,
+                count=count,
+                adjust_type=AdjustType.NoAdjust
+            )
             
-            # 分批获取更多历史数据
-            batches = max(days // 200, 2)
-            for batch in range(batches):
-                try:
-                    klines = self.quote_ctx.candlesticks(
-                        symbol=self.symbol,
-                        period=Period.Day,
-                        count=min(200, days - len(all_data)),
-                        adjust_type=AdjustType.NoAdjust
-                    )
-                    
-                    batch_data = []
-                    for k in klines:
-                        batch_data.append({
-                            'date': k.timestamp.date(),
-                            'open': float(k.open),
-                            'high': float(k.high),
-                            'low': float(k.low),
-                            'close': float(k.close),
-                            'volume': float(k.volume)
-                        })
-                    
-                    if not batch_data:
-                        break
-                        
-                    all_data.extend(batch_data)
-                    await asyncio.sleep(0.5)  # 避免API限制
-                    
-                    if len(all_data) >= days:
-                        break
-                        
-                except Exception as e:
-                    logger.warning(f"批次{batch+1}数据获取失败: {e}")
-                    continue
+            # 按日期去重，排序后直接按列构建，无需DataFrame排序和去重；
+            # 行情数值原样保存，构建数组时由NumPy统一转换为float
+            by_date = {}
+            for k in klines:
+                by_date[k.timestamp.date()] = (k.open, k.high, k.low, k.close, k.volume)
             
-            if not all_data:
+            if not by_date:
                 return pd.DataFrame()
             
-            df = pd.DataFrame(all_data)
-            df = df.sort_values('date').drop_duplicates(subset=['date'])
-            df = df.reset_index(drop=True)
+            dates = sorted(by_date)
+            cols = np.array([by_date[d] for d in dates], dtype=float)
+            df = pd.DataFrame({
+                'date': dates,
+                'open': cols[:, 0],
+                'high': cols[:, 1],
+                'low': cols[:, 2],
+                'close': cols[:, 3],
+                'volume': cols[:, 4]
+            })
             
-            # 计算日收益率
-            df['daily_return'] = df['close'].pct_change()
+            # 计算日收益率（首日无前收盘，直接记为0）
+            closes = cols[:, 3]
+            df['daily_return'] = np.concatenate(([0.0], closes[1:] / closes[:-1] - 1))
             
-            # 添加月份信息
-            df['year_month'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m')
+            # 添加月份信息（整数键 YYYYMM，仅在输出时格式化为 YYYY-MM）
+            month_index = pd.DatetimeIndex(dates)
+            df['year_month_int'] = (month_index.year * 100 + month_index.month).to_numpy(dtype=np.int32)
             
             logger.info(f"成功获取RSP历史数据: {len(df)}天")
-            logger.info(f"数据范围: {df['date'].min()} 至 {df['date'].max()}")
+            logger.info(f"数据范围: {dates[0]} 至 {dates[-1]}")
             
             return df
             
@@ -116,52 +161,38 @@ class RSPBacktestMonitor:
             logger.error(f"获取历史数据失败: {e}")
             return pd.DataFrame()
     
-    def is_third_friday(self, check_date: date) -> bool:
-        """判断是否为当月第三个周五"""
-        try:
-            year, month = check_date.year, check_date.month
-            fridays = []
-            
-            current_date = date(year, month, 1)
-            while current_date.month == month:
-                if current_date.weekday() == 4:  # 周五
-                    fridays.append(current_date)
-                current_date += timedelta(days=1)
-            
-            if len(fridays) >= 3:
-                return check_date == fridays[2]
-            else:
-                return check_date == fridays[-1] if fridays else False
-                
-        except Exception as e:
-            logger.error(f"判断第三个周五失败: {e}")
-            return False
+    def third_friday(self, year: int, month: int) -> date:
+        """计算当月第三个周五"""
+        first = date(year, month, 1)
+        return first + timedelta(days=(4 - first.weekday()) % 7 + 14)
     
-    def simulate_market_breadth(self, date_val: date, volatility: float) -> float:
-        """模拟市场宽度数据"""
-        try:
-            # 基于日期和波动率生成伪随机但一致的市场宽度
-            import random
-            seed = int(date_val.strftime('%Y%m%d')) % 10000
-            random.seed(seed)
-            
-            # 高波动时市场宽度更低
-            base_breadth = 30.0 - (volatility * 100)  # 波动率越高，市场宽度越低
-            variation = random.uniform(-15, 15)
-            breadth = max(5.0, min(50.0, base_breadth + variation))
-            
-            return breadth
-            
-        except Exception as e:
-            logger.error(f"模拟市场宽度失败: {e}")
-            return 25.0
+    def simulate_market_breadth_vec(self, dates_int: np.ndarray, volatility: np.ndarray) -> np.ndarray:
+        """批量模拟市场宽度数据（dates_int为YYYYMMDD整数）"""
+        # 基于日期和波动率生成伪随机但一致的市场宽度
+        # 对日期做乘法哈希映射到[0, 1)，不依赖也不修改全局随机数状态
+        seed = dates_int % 10000
+        unit = ((seed * 2654435761) & 0xFFFFFFFF).astype(np.float64) / 4294967296.0
+        
+        # 高波动时市场宽度更低
+        base_breadth = 30.0 - (volatility * 100)  # 波动率越高，市场宽度越低
+        variation = unit * 30 - 15
+        return np.clip(base_breadth + variation, 5.0, 50.0)
     
-    def analyze_month(self, monthly_data: pd.DataFrame, month_str: str) -> dict:
-        """分析单个月份的触发情况"""
+    def analyze_month_np(self, dates: np.ndarray, opens: np.ndarray, closes: np.ndarray,
+                         rets: np.ndarray, month_str: str) -> dict:
+        """分析单个月份的触发情况（输入为当月各列的NumPy数组）"""
         try:
-            if monthly_data.empty:
+            n = len(closes)
+            if n == 0:
                 return None
             
+            # 获取月初和月末价格
+            month_start_price = opens[0]
+            month_end_price = closes[-1]
+            
+            # 计算累计跌幅（从月初到每天）
+            cum_decl = (month_start_price - closes) / month_start_price
+            
             # 初始化月度状态
             month_state = {
                 'month': month_str,
@@ -170,102 +201,65 @@ class RSPBacktestMonitor:
                 'second_dip_triggered': False,
                 'third_dip_triggered': False,
                 'triggers': [],
-                'month_start_price': None,
-                'month_end_price': None,
-                'month_return': 0,
-                'max_decline': 0,
-                'trading_days': len(monthly_data)
+                'month_start_price': month_start_price,
+                'month_end_price': month_end_price,
+                'month_return': (month_end_price - month_start_price) / month_start_price,
+                'max_decline': max(0.0, float(cum_decl.max())),
+                'trading_days': n
             }
             
-            # 获取月初和月末价格
-            month_state['month_start_price'] = float(monthly_data.iloc[0]['open'])
-            month_state['month_end_price'] = float(monthly_data.iloc[-1]['close'])
-            month_state['month_return'] = (month_state['month_end_price'] - month_state['month_start_price']) / month_state['month_start_price']
+            # 第三个周五在本月中的序号（当月无该交易日时为-1）
+            third_friday = self.third_friday(dates[0].year, dates[0].month)
+            deadline_hits = np.flatnonzero(dates == third_friday)
+            third_friday_idx = int(deadline_hits[0]) if len(deadline_hits) else -1
             
-            # 逐日分析
-            for i, (idx, row) in enumerate(monthly_data.iterrows()):
-                current_date = row['date']
-                current_close = float(row['close'])
-                daily_return = float(row['daily_return']) if not pd.isna(row['daily_return']) else 0
-                
-                # 计算累计跌幅（从月初到当前）
-                cumulative_decline = (month_state['month_start_price'] - current_close) / month_state['month_start_price']
-                month_state['max_decline'] = max(month_state['max_decline'], cumulative_decline)
-                
-                # 模拟每天晚上9点检查（基于当天收盘数据）
-                
-                # 条件1: 每月第一次日跌幅≥1%
-                if (not month_state['first_dip_triggered'] and 
-                    not month_state['monthly_deadline_triggered'] and
-                    daily_return <= -0.01):
-                    
-                    trigger = {
-                        'date': current_date,
-                        'type': 'first_dip',
-                        'condition': '日跌幅≥1%',
-                        'daily_return': daily_return,
-                        'price': current_close,
-                        'cumulative_decline': cumulative_decline
-                    }
-                    month_state['triggers'].append(trigger)
-                    month_state['first_dip_triggered'] = True
-                
-                # 条件2: 第三个周五到期提醒
-                elif (not month_state['first_dip_triggered'] and 
-                      not month_state['monthly_deadline_triggered'] and
-                      self.is_third_friday(current_date)):
-                    
-                    trigger = {
-                        'date': current_date,
-                        'type': 'monthly_deadline',
-                        'condition': '第三个周五到期',
-                        'daily_return': daily_return,
-                        'price': current_close,
-                        'cumulative_decline': cumulative_decline
-                    }
-                    month_state['triggers'].append(trigger)
-                    month_state['monthly_deadline_triggered'] = True
-                
-                # 条件3: 累计跌幅≥5%
-                if (not month_state['second_dip_triggered'] and
-                    cumulative_decline >= 0.05):
-                    
-                    trigger = {
-                        'date': current_date,
-                        'type': 'second_dip',
-                        'condition': '月累计跌幅≥5%',
-                        'daily_return': daily_return,
-                        'price': current_close,
-                        'cumulative_decline': cumulative_decline
-                    }
-                    month_state['triggers'].append(trigger)
-                    month_state['second_dip_triggered'] = True
-                
-                # 条件4: 市场宽度<15%（在第二笔触发后）
-                if (month_state['second_dip_triggered'] and 
-                    not month_state['third_dip_triggered']):
-                    
-                    # 计算最近几天的波动率
-                    if i >= 5:
-                        recent_returns = monthly_data.iloc[max(0, i-4):i+1]['daily_return'].dropna()
-                        volatility = recent_returns.std() if len(recent_returns) > 1 else 0.01
-                    else:
-                        volatility = 0.01
-                    
-                    market_breadth = self.simulate_market_breadth(current_date, volatility)
-                    
-                    if market_breadth < 15:
-                        trigger = {
-                            'date': current_date,
-                            'type': 'third_dip',
-                            'condition': '市场宽度<15%',
-                            'daily_return': daily_return,
-                            'price': current_close,
-                            'cumulative_decline': cumulative_decline,
-                            'market_breadth': market_breadth
-                        }
-                        month_state['triggers'].append(trigger)
-                        month_state['third_dip_triggered'] = True
+            # 市场宽度只在第二笔触发（累计跌幅≥5%）之后才需要
+            breadths = np.full(n, np.inf)
+            second_mask = cum_decl >= 0.05
+            if second_mask.any():
+                second_start = int(np.argmax(second_mask))
+                # 最近5天的波动率只计算一次；前5个交易日使用默认值
+                rolling_vol = pd.Series(rets).rolling(5).std().to_numpy()
+                volatility = np.where(np.arange(n) >= 5, rolling_vol, 0.01)[second_start:]
+                dates_int = np.array(
+                    [d.year * 10000 + d.month * 100 + d.day for d in dates[second_start:]],
+                    dtype=np.int64
+                )
+                breadths[second_start:] = self.simulate_market_breadth_vec(dates_int, volatility)
+            
+            # 模拟每天晚上9点检查（基于当天收盘数据）
+            first_idx, deadline_idx, second_idx, third_idx = _scan_month(
+                rets, cum_decl, third_friday_idx, breadths
+            )
+            
+            # 各条件的触发日：(日序号, 同日检查顺序, 类型, 条件描述)
+            hits = []
+            if first_idx >= 0:
+                hits.append((first_idx, 0, 'first_dip', '日跌幅≥1%'))
+                month_state['first_dip_triggered'] = True
+            if deadline_idx >= 0:
+                hits.append((deadline_idx, 0, 'monthly_deadline', '第三个周五到期'))
+                month_state['monthly_deadline_triggered'] = True
+            if second_idx >= 0:
+                hits.append((second_idx, 1, 'second_dip', '月累计跌幅≥5%'))
+                month_state['second_dip_triggered'] = True
+            if third_idx >= 0:
+                hits.append((third_idx, 2, 'third_dip', '市场宽度<15%'))
+                month_state['third_dip_triggered'] = True
+            
+            # 按检查顺序生成触发记录（每月最多4条）
+            for i, _, trigger_type, condition in sorted(hits):
+                trigger = {
+                    'date': dates[i],
+                    'type': trigger_type,
+                    'condition': condition,
+                    'daily_return': float(rets[i]),
+                    'price': float(closes[i]),
+                    'cumulative_decline': float(cum_decl[i])
+                }
+                if trigger_type == 'third_dip':
+                    trigger['market_breadth'] = float(breadths[i])
+                month_state['triggers'].append(trigger)
             
             return month_state
             
@@ -283,16 +277,22 @@ class RSPBacktestMonitor:
             logger.error("无法获取历史数据")
             return
         
-        # 按月份分组分析
-        monthly_groups = df.groupby('year_month')
+        # 按月份切分分析：数据已按日期排序，同月数据连续，直接按边界切片
+        dates = df['date'].to_numpy()
+        opens = df['open'].to_numpy(dtype=float)
+        closes = df['close'].to_numpy(dtype=float)
+        rets = df['daily_return'].to_numpy(dtype=float)
+        month_keys, starts = np.unique(df['year_month_int'].to_numpy(), return_index=True)
+        ends = np.append(starts[1:], len(df))
         
-        for month_str, monthly_data in monthly_groups:
-            if len(monthly_data) < 5:  # 跳过数据不足的月份
+        for month_key, s, e in zip(month_keys, starts, ends):
+            if e - s < 5:  # 跳过数据不足的月份
                 continue
-                
-            month_result = self.analyze_month(monthly_data, month_str)
+            
+            month_str = f"{month_key // 100}-{month_key % 100:02d}"
+            month_result = self.analyze_month_np(dates[s:e], opens[s:e], closes[s:e], rets[s:e], month_str)
             if month_result:
-                self.backtest_results.append(month_result)
+                self.record_month(month_result)
                 
                 # 更新统计
                 self.trigger_summary['total_months'] += 1
@@ -308,117 +308,137 @@ class RSPBacktestMonitor:
         # 生成报告
         self.generate_backtest_report()
     
+    def record_month(self, month_result: dict):
+        """把单月分析结果追加到按列存放的结果表中"""
+        month = month_result['month']
+        months = self.months
+        months['month'].append(month)
+        months['month_start_price'].append(month_result['month_start_price'])
+        months['month_end_price'].append(month_result['month_end_price'])
+        months['month_return'].append(month_result['month_return'])
+        months['max_decline'].append(month_result['max_decline'])
+        months['trading_days'].append(month_result['trading_days'])
+        months['total_triggers'].append(len(month_result['triggers']))
+        
+        triggers = self.triggers
+        for trigger in month_result['triggers']:
+            triggers['month'].append(month)
+            triggers['trigger_date'].append(trigger['date'])
+            triggers['trigger_type'].append(trigger['type'])
+            triggers['trigger_condition'].append(trigger['condition'])
+            triggers['trigger_daily_return'].append(trigger['daily_return'])
+            triggers['trigger_price'].append(trigger['price'])
+            triggers['trigger_cumulative_decline'].append(trigger['cumulative_decline'])
+            triggers['trigger_market_breadth'].append(trigger.get('market_breadth', np.nan))
+    
     def generate_backtest_report(self):
         """生成回测报告"""
-        print("\n" + "="*80)
-        print("📊 RSP ETF定投监控系统 - 回测报告")
-        print("="*80)
-        print(f"📅 回测期间: {len(self.backtest_results)} 个月")
-        print(f"⏰ 执行时间: 每日21:00（基于前一交易日数据）")
-        print(f"📈 监控标的: RSP (标普500等权ETF)")
+        # 报告先写入缓冲，最后一次性输出到终端和日志文件
+        out = []
+        p = out.append
+        p("\n" + "="*80)
+        p("📊 RSP ETF定投监控系统 - 回测报告")
+        p("="*80)
+        months = self.months
+        triggers = self.triggers
+        p(f"📅 回测期间: {len(months['month'])} 个月")
+        p(f"⏰ 执行时间: 每日21:00（基于前一交易日数据）")
+        p(f"📈 监控标的: RSP (标普500等权ETF)")
         
-        if not self.backtest_results:
-            print("❌ 无回测数据")
+        if not months['month']:
+            p("❌ 无回测数据")
+            self._emit_report(out)
             return
         
         # 统计摘要
-        print(f"\n📊 触发统计摘要:")
-        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        print(f"总监控月数: {self.trigger_summary['total_months']}")
-        print(f"第一笔定投触发: {self.trigger_summary['first_dip_triggered']} 次 ({self.trigger_summary['first_dip_triggered']/self.trigger_summary['total_months']:.1%})")
-        print(f"到期提醒触发: {self.trigger_summary['monthly_deadline_triggered']} 次 ({self.trigger_summary['monthly_deadline_triggered']/self.trigger_summary['total_months']:.1%})")
-        print(f"第二笔定投触发: {self.trigger_summary['second_dip_triggered']} 次 ({self.trigger_summary['second_dip_triggered']/self.trigger_summary['total_months']:.1%})")
-        print(f"第三笔定投触发: {self.trigger_summary['third_dip_triggered']} 次 ({self.trigger_summary['third_dip_triggered']/self.trigger_summary['total_months']:.1%})")
+        p(f"\n📊 触发统计摘要:")
+        p(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        p(f"总监控月数: {self.trigger_summary['total_months']}")
+        p(f"第一笔定投触发: {self.trigger_summary['first_dip_triggered']} 次 ({self.trigger_summary['first_dip_triggered']/self.trigger_summary['total_months']:.1%})")
+        p(f"到期提醒触发: {self.trigger_summary['monthly_deadline_triggered']} 次 ({self.trigger_summary['monthly_deadline_triggered']/self.trigger_summary['total_months']:.1%})")
+        p(f"第二笔定投触发: {self.trigger_summary['second_dip_triggered']} 次 ({self.trigger_summary['second_dip_triggered']/self.trigger_summary['total_months']:.1%})")
+        p(f"第三笔定投触发: {self.trigger_summary['third_dip_triggered']} 次 ({self.trigger_summary['third_dip_triggered']/self.trigger_summary['total_months']:.1%})")
         
         # 详细触发记录
-        print(f"\n📋 详细触发记录:")
-        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        p(f"\n📋 详细触发记录:")
+        p(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
         
-        total_triggers = 0
-        for result in self.backtest_results:
-            if result['triggers']:
-                print(f"\n📅 {result['month']} (月收益: {result['month_return']:+.2%}, 最大跌幅: {result['max_decline']:.2%})")
-                for trigger in result['triggers']:
-                    total_triggers += 1
-                    breadth_info = f", 市场宽度: {trigger['market_breadth']:.1f}%" if 'market_breadth' in trigger else ""
-                    print(f"   🔔 {trigger['date']} - {trigger['condition']} (日收益: {trigger['daily_return']:+.2%}, 价格: ${trigger['price']:.2f}){breadth_info}")
+        # 触发记录按月份顺序存放，按每月触发数依次切分
+        total_triggers = len(triggers['month'])
+        pos = 0
+        for month, month_return, max_decline, count in zip(
+                months['month'], months['month_return'], months['max_decline'], months['total_triggers']):
+            if not count:
+                continue
+            p(f"\n📅 {month} (月收益: {month_return:+.2%}, 最大跌幅: {max_decline:.2%})")
+            for i in range(pos, pos + count):
+                breadth = triggers['trigger_market_breadth'][i]
+                breadth_info = f", 市场宽度: {breadth:.1f}%" if not np.isnan(breadth) else ""
+                p(f"   🔔 {triggers['trigger_date'][i]} - {triggers['trigger_condition'][i]} (日收益: {triggers['trigger_daily_return'][i]:+.2%}, 价格: ${triggers['trigger_price'][i]:.2f}){breadth_info}")
+            pos += count
         
-        print(f"\n💡 回测洞察:")
-        print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-        print(f"总触发次数: {total_triggers}")
-        print(f"平均每月触发: {total_triggers/self.trigger_summary['total_months']:.1f} 次")
+        p(f"\n💡 回测洞察:")
+        p(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+        p(f"总触发次数: {total_triggers}")
+        p(f"平均每月触发: {total_triggers/self.trigger_summary['total_months']:.1f} 次")
         
         # 月收益率分析
-        monthly_returns = [r['month_return'] for r in self.backtest_results]
-        max_declines = [r['max_decline'] for r in self.backtest_results]
+        monthly_returns = np.asarray(months['month_return'], dtype=float)
+        max_declines = np.asarray(months['max_decline'], dtype=float)
         
-        print(f"月收益率统计:")
-        print(f"   平均月收益: {np.mean(monthly_returns):+.2%}")
-        print(f"   月收益标准差: {np.std(monthly_returns):.2%}")
-        print(f"   最好月份: {max(monthly_returns):+.2%}")
-        print(f"   最差月份: {min(monthly_returns):+.2%}")
+        p(f"月收益率统计:")
+        p(f"   平均月收益: {monthly_returns.mean():+.2%}")
+        p(f"   月收益标准差: {monthly_returns.std():.2%}")
+        p(f"   最好月份: {monthly_returns.max():+.2%}")
+        p(f"   最差月份: {monthly_returns.min():+.2%}")
         
-        print(f"最大跌幅统计:")
-        print(f"   平均最大跌幅: {np.mean(max_declines):.2%}")
-        print(f"   最大跌幅: {max(max_declines):.2%}")
+        p(f"最大跌幅统计:")
+        p(f"   平均最大跌幅: {max_declines.mean():.2%}")
+        p(f"   最大跌幅: {max_declines.max():.2%}")
         
         # 策略有效性分析
-        trigger_months = len([r for r in self.backtest_results if r['triggers']])
-        decline_months = len([r for r in self.backtest_results if r['month_return'] < 0])
+        trigger_months = int(np.count_nonzero(months['total_triggers']))
+        decline_months = int((monthly_returns < 0).sum())
         
-        print(f"\n🎯 策略有效性:")
-        print(f"触发月份数: {trigger_months}")
-        print(f"下跌月份数: {decline_months}")
-        print(f"触发覆盖率: {trigger_months/decline_months:.1%}" if decline_months > 0 else "触发覆盖率: N/A")
+        p(f"\n🎯 策略有效性:")
+        p(f"触发月份数: {trigger_months}")
+        p(f"下跌月份数: {decline_months}")
+        p(f"触发覆盖率: {trigger_months/decline_months:.1%}" if decline_months > 0 else "触发覆盖率: N/A")
+        
+        self._emit_report(out)
         
         # 保存详细结果
         self.save_backtest_results()
     
+    def _emit_report(self, lines: list):
+        """一次性输出报告：终端一次写入，日志文件一条记录"""
+        text = '\n'.join(lines)
+        sys.stdout.write(text + '\n')
+        report_logger.info(text)
+    
     def save_backtest_results(self):
         """保存回测结果"""
         try:
-            # 保存详细结果到CSV
-            detailed_results = []
-            for result in self.backtest_results:
-                base_record = {
-                    'month': result['month'],
-                    'month_start_price': result['month_start_price'],
-                    'month_end_price': result['month_end_price'],
-                    'month_return': result['month_return'],
-                    'max_decline': result['max_decline'],
-                    'trading_days': result['trading_days'],
-                    'total_triggers': len(result['triggers'])
-                }
-                
-                if result['triggers']:
-                    for trigger in result['triggers']:
-                        record = base_record.copy()
-                        record.update({
-                            'trigger_date': trigger['date'],
-                            'trigger_type': trigger['type'],
-                            'trigger_condition': trigger['condition'],
-                            'trigger_daily_return': trigger['daily_return'],
-                            'trigger_price': trigger['price'],
-                            'trigger_cumulative_decline': trigger['cumulative_decline'],
-                            'trigger_market_breadth': trigger.get('market_breadth', None)
-                        })
-                        detailed_results.append(record)
-                else:
-                    detailed_results.append(base_record)
-            
-            df_results = pd.DataFrame(detailed_results)
+            # 保存详细结果到CSV：月度指标左连接触发记录，无触发的月份保留一行
+            df_results = pd.DataFrame(self.months).merge(
+                pd.DataFrame(self.triggers), on='month', how='left'
+            )
             df_results.to_csv('rsp_backtest_results.csv', index=False, encoding='utf-8-sig')
             
             # 保存汇总统计
             summary = {
                 'backtest_summary': self.trigger_summary,
-                'total_triggers': sum(len(r['triggers']) for r in self.backtest_results),
-                'backtest_period': f"{self.backtest_results[0]['month']} to {self.backtest_results[-1]['month']}" if self.backtest_results else "No data"
+                'total_triggers': len(self.triggers['month']),
+                'backtest_period': f"{self.months['month'][0]} to {self.months['month'][-1]}" if self.months['month'] else "No data"
             }
             
-            with open('rsp_backtest_summary.json', 'w', encoding='utf-8') as f:
-                import json
-                json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
+            if orjson is not None:
+                Path('rsp_backtest_summary.json').write_bytes(orjson.dumps(
+                    summary, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY, default=str
+                ))
+            else:
+                with open('rsp_backtest_summary.json', 'w', encoding='utf-8') as f:
+                    json.dump(summary, f, ensure_ascii=False, indent=2, default=str)
             
             print(f"\n📁 回测结果已保存:")
             print(f"   详细结果: rsp_backtest_results.csv")
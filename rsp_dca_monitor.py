@@ -4,25 +4,41 @@
 import os
 import sys
 import json
-import requests
+import argparse
 import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta
 from pathlib import Path
-import pandas as pd
-from longport.openapi import Config, QuoteContext, Period, AdjustType
+import numpy as np
 import warnings
 warnings.filterwarnings('ignore')
 
+# 文件锁仅在类Unix系统上可用，Windows上不做并发保护
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# JSON读写优先使用orjson，未安装时回退到标准库json（均为紧凑格式的UTF-8字节）
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    _json_loads = json.loads
+    
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 # 导入市场宽度获取器
 try:
     from market_breadth_fetcher import MarketBreadthFetcher
 except ImportError:
     # 如果导入失败，使用简化版本
     class MarketBreadthFetcher:
-        def get_market_breadth(self):
+        def get_market_breadth(self, simulate_on_failure=True):
             import random
-            return random.uniform(10, 30)
+            return random.uniform(10, 30) if simulate_on_failure else None
 
 # 配置日志
 logging.basicConfig(
@@ -38,14 +54,25 @@ logger = logging.getLogger(__name__)
 class RSPMonitor:
     """RSP ETF定投监控系统"""
     
-    def __init__(self, sckey: str = None):
+    def __init__(self, sckey: str = None, quiet: bool = False, verbose: bool = False,
+                 split_alerts: bool = False):
         self.symbol = 'RSP.US'  # 标普500等权ETF
         self.sckey = sckey  # Server酱密钥
+        self.quiet = quiet  # 为True时不在终端输出状态信息（定时任务使用）
+        self.verbose = verbose  # 为True时无触发也输出完整状态
+        self.split_alerts = split_alerts  # 为True时每个触发提醒单独推送
         self.quote_ctx = None
+        self._http = None  # Server酱推送共用的HTTP会话，在initialize中创建
         
         # 状态文件路径
         self.state_file = Path('rsp_monitor_state.json')
         
+        # 日K线缓存文件：重复运行时只需补取缓存之后的几天
+        self.candle_cache_file = Path('rsp_candles.json')
+        
+        # 锁文件：防止定时任务重叠时重复推送、同时写状态文件
+        self.lock_file = Path('rsp_monitor.lock')
+        
         # 默认状态
         self.default_state = {
             'current_month': '',
@@ -55,11 +82,14 @@ class RSPMonitor:
             'third_dip_triggered': False,
             'month_start_price': None,
             'month_low_price': None,
+            'last_close': None,
             'last_check_date': '',
-            'monthly_returns': []
+            'monthly_returns': [],
+            'breadth_cache': {}  # 按日期缓存的市场宽度，同一天重复运行时不再请求
         }
         
-        # 加载状态
+        # 加载状态（_dirty标记内存中的状态是否有未写盘的修改）
+        self._dirty = False
         self.state = self.load_state()
         
         # 初始化市场宽度获取器
@@ -69,29 +99,46 @@ class RSPMonitor:
         """加载监控状态"""
         try:
             if self.state_file.exists():
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
+                state = _json_loads(self.state_file.read_bytes())
                 logger.info("成功加载监控状态")
                 return state
             else:
                 logger.info("创建新的监控状态")
+                self._dirty = True
                 return self.default_state.copy()
         except Exception as e:
-            logger.error(f"加载状态失败: {e}")
+            logger.error("加载状态失败: %s", e)
+            self._dirty = True
             return self.default_state.copy()
     
+    def update_state(self, **changes):
+        """修改监控状态，仅在值确实变化时标记为待保存"""
+        for key, value in changes.items():
+            if self.state.get(key) != value:
+                self.state[key] = value
+                self._dirty = True
+    
     def save_state(self):
-        """保存监控状态"""
+        """保存监控状态（无修改时跳过；先写临时文件再原子替换，避免写坏状态文件）"""
+        if not self._dirty:
+            logger.info("监控状态无变化，跳过保存")
+            return
         try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(self.state, f, ensure_ascii=False, indent=2)
+            tmp_file = self.state_file.with_suffix('.tmp')
+            tmp_file.write_bytes(_json_dumps(self.state))
+            os.replace(tmp_file, self.state_file)
+            self._dirty = False
             logger.info("成功保存监控状态")
         except Exception as e:
-            logger.error(f"保存状态失败: {e}")
+            logger.error("保存状态失败: %s", e)
     
     async def initialize(self):
         """初始化长桥API"""
         try:
+            # 按需导入：当日已检查过等提前退出的情况下无需加载这些模块
+            import aiohttp
+            from longport.openapi import Config, QuoteContext
+            
             # 检查必要的环境变量
             required_vars = ['LONGPORT_APP_KEY', 'LONGPORT_APP_SECRET', 'LONGPORT_ACCESS_TOKEN']
             missing_vars = [var for var in required_vars if not os.getenv(var)]
@@ -101,99 +148,160 @@ class RSPMonitor:
             
             config = Config.from_env()
             self.quote_ctx = QuoteContext(config)
+            # 同一会话内的多次推送复用keep-alive连接，只连Server酱一个主机，连接池无需太大
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=4, limit_per_host=4),
+                timeout=aiohttp.ClientTimeout(total=10)
+            )
             logger.info("成功初始化RSP监控系统")
             return True
         except Exception as e:
-            logger.error(f"初始化失败: {e}")
+            logger.error("初始化失败: %s", e)
             return False
     
-    async def get_rsp_data(self, days: int = 30) -> pd.DataFrame:
-        """获取RSP历史数据"""
+    def load_candle_cache(self) -> dict:
+        """加载日K线缓存：{日期: (开, 高, 低, 收, 量)}，标的或复权方式不一致时视为无缓存"""
+        try:
+            if not self.candle_cache_file.exists():
+                return {}
+            cached = _json_loads(self.candle_cache_file.read_bytes())
+            if cached.get('symbol') != self.symbol or cached.get('adjust_type') != 'NoAdjust':
+                logger.info("K线缓存与当前标的或复权方式不一致，重新获取")
+                return {}
+            return {date.fromisoformat(row[0]): tuple(row[1:]) for row in cached['candles']}
+        except Exception as e:
+            logger.warning("加载K线缓存失败: %s", e)
+            return {}
+    
+    def save_candle_cache(self, candles: dict):
+        """保存日K线缓存（先写临时文件再原子替换）"""
         try:
-            # 获取日线数据
-            klines = self.quote_ctx.candlesticks(
+            cached = {
+                'symbol': self.symbol,
+                'adjust_type': 'NoAdjust',
+                'candles': [[d.isoformat(), *candles[d]] for d in sorted(candles)]
+            }
+            tmp_file = self.candle_cache_file.with_suffix('.tmp')
+            tmp_file.write_bytes(_json_dumps(cached))
+            os.replace(tmp_file, self.candle_cache_file)
+        except Exception as e:
+            logger.warning("保存K线缓存失败: %s", e)
+    
+    async def get_rsp_data(self, days: int = 30) -> dict:
+        """获取RSP历史数据（按日期排序的各列数组，失败时返回空字典）"""
+        try:
+            from longport.openapi import Period, AdjustType
+            
+            # 缓存足够时只补取最后缓存日（可能是盘中数据）之后的K线
+            candles = self.load_candle_cache()
+            count = days
+            if len(candles) >= days:
+                missing_days = (datetime.now().date() - max(candles)).days + 1
+                count = max(1, min(days, missing_days + 1))
+            
+            # 获取日线数据：同步接口放到线程中执行，避免阻塞事件循环
+            klines = await asyncio.to_thread(
+                self.quote_ctx.candlesticks,
                 symbol=self.symbol,
                 period=Period.Day,
-                count=days,
+                count=count,
                 adjust_type=AdjustType.NoAdjust
             )
             
             if not klines:
                 logger.error("无法获取RSP数据")
-                return pd.DataFrame()
+                return {}
             
-            data = []
+            # 新数据覆盖缓存中的同日K线，只保留最近days个交易日
             for k in klines:
-                data.append({
-                    'date': k.timestamp.date(),
-                    'open': float(k.open),
-                    'high': float(k.high),
-                    'low': float(k.low),
-                    'close': float(k.close),
-                    'volume': float(k.volume)
-                })
+                candles[k.timestamp.date()] = (
+                    float(k.open), float(k.high), float(k.low), float(k.close), float(k.volume)
+                )
+            dates = sorted(candles)[-days:]
+            candles = {d: candles[d] for d in dates}
+            self.save_candle_cache(candles)
             
-            df = pd.DataFrame(data)
-            df = df.sort_values('date').reset_index(drop=True)
+            opens = np.fromiter((candles[d][0] for d in dates), dtype=np.float64, count=len(dates))
+            closes = np.fromiter((candles[d][3] for d in dates), dtype=np.float64, count=len(dates))
             
-            # 计算日收益率
-            df['daily_return'] = df['close'].pct_change()
+            # 计算日收益率（首日无前收盘，记为NaN）
+            daily_return = np.empty_like(closes)
+            daily_return[0] = np.nan
+            daily_return[1:] = closes[1:] / closes[:-1] - 1
+            
+            data = {
+                'date': dates,
+                'open': opens,
+                'close': closes,
+                'daily_return': daily_return
+            }
             
-            logger.info(f"成功获取RSP数据: {len(df)}天")
-            return df
+            logger.info("成功获取RSP数据: %d天（本次请求%d条）", len(dates), len(klines))
+            return data
             
         except Exception as e:
-            logger.error(f"获取RSP数据失败: {e}")
-            return pd.DataFrame()
+            logger.error("获取RSP数据失败: %s", e)
+            return {}
     
     def get_market_breadth(self) -> float:
-        """获取市场宽度数据"""
+        """获取市场宽度数据（当日已获取过则直接使用状态中的缓存）"""
         try:
-            return self.breadth_fetcher.get_market_breadth()
+            today = datetime.now().date()
+            today_str = today.strftime('%Y-%m-%d')
+            cache = self.state.get('breadth_cache') or {}
+            if today_str in cache:
+                logger.info("使用缓存的市场宽度数据: %.1f%%", cache[today_str])
+                return cache[today_str]
+            
+            # 只缓存真实数据源的结果；全部失败时不写缓存，之后重新运行仍会再次请求
+            breadth = self.breadth_fetcher.get_market_breadth(simulate_on_failure=False)
+            if breadth is None:
+                logger.warning("市场宽度数据源均不可用，使用默认值20.0%")
+                return 20.0
+            
+            # 写入当日数值，同时清理7天前的缓存
+            cutoff = (today - timedelta(days=7)).strftime('%Y-%m-%d')
+            cache = {d: v for d, v in cache.items() if d >= cutoff}
+            cache[today_str] = breadth
+            self.update_state(breadth_cache=cache)
+            return breadth
         except Exception as e:
-            logger.warning(f"获取市场宽度失败: {e}")
+            logger.warning("获取市场宽度失败: %s", e)
             # 返回默认值，避免触发第三笔定投
             return 20.0
     
     def is_third_friday(self, date) -> bool:
         """判断是否为当月第三个周五"""
         try:
-            # 获取当月所有周五
-            year, month = date.year, date.month
-            fridays = []
-            
-            # 遍历当月所有日期
-            current_date = datetime(year, month, 1).date()
-            while current_date.month == month:
-                if current_date.weekday() == 4:  # 周五
-                    fridays.append(current_date)
-                current_date += timedelta(days=1)
-            
-            # 检查是否为第三个周五
-            if len(fridays) >= 3:
-                return date == fridays[2]
-            else:
-                # 如果当月周五不足3个，返回最后一个周五
-                return date == fridays[-1] if fridays else False
+            # 第三个周五 = 当月第一个周五 + 14天，直接由1号的星期推算
+            # （每月至少28天、必有4个周五，不存在周五不足3个的情况）
+            first_weekday = date.replace(day=1).weekday()
+            return date.day == 15 + (4 - first_weekday) % 7
                 
         except Exception as e:
-            logger.error(f"判断第三个周五失败: {e}")
+            logger.error("判断第三个周五失败: %s", e)
             return False
     
     def reset_monthly_state(self, current_month: str):
         """重置月度状态"""
-        logger.info(f"重置月度状态: {current_month}")
-        self.state.update({
-            'current_month': current_month,
-            'first_dip_triggered': False,
-            'monthly_deadline_triggered': False,
-            'second_dip_triggered': False,
-            'third_dip_triggered': False,
-            'month_start_price': None,
-            'month_low_price': None
-        })
+        logger.info("重置月度状态: %s", current_month)
+        self.update_state(
+            current_month=current_month,
+            first_dip_triggered=False,
+            monthly_deadline_triggered=False,
+            second_dip_triggered=False,
+            third_dip_triggered=False,
+            month_start_price=None,
+            month_low_price=None
+        )
     
-    def send_wechat(self, msg: str):
+    async def aclose(self):
+        """关闭HTTP会话"""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+    
+    async def send_wechat(self, msg: str):
         """发送微信提醒"""
         try:
             if not self.sckey:
@@ -206,61 +314,70 @@ class RSPMonitor:
                 "desp": msg
             }
             
-            response = requests.post(url, data=data, timeout=10)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('code') == 0:
-                    logger.info("微信提醒发送成功")
-                    return True
+            async with self._http.post(url, data=data) as response:
+                if response.status == 200:
+                    result = await response.json(content_type=None)
+                    if result.get('code') == 0:
+                        logger.info("微信提醒发送成功")
+                        return True
+                    else:
+                        logger.error("微信提醒发送失败: %s", result)
+                        return False
                 else:
-                    logger.error(f"微信提醒发送失败: {result}")
+                    logger.error("微信提醒请求失败: %s", response.status)
                     return False
-            else:
-                logger.error(f"微信提醒请求失败: {response.status_code}")
-                return False
                 
         except Exception as e:
-            logger.error(f"发送微信提醒异常: {e}")
+            logger.error("发送微信提醒异常: %s", e)
             return False
     
     async def check_triggers(self):
         """检查触发条件"""
         try:
-            # 获取数据
-            df = await self.get_rsp_data(days=60)
-            if df.empty:
-                logger.error("无法获取RSP数据，跳过检查")
-                return
-            
             today = datetime.now().date()
             current_month = today.strftime('%Y-%m')
             
+            # 获取数据：本月已触发第二笔且未触发第三笔时必然要查市场宽度，与行情数据并发获取
+            market_breadth = None
+            if (self.state['current_month'] == current_month and
+                self.state['second_dip_triggered'] and
+                not self.state['third_dip_triggered']):
+                market_breadth, data = await asyncio.gather(
+                    asyncio.to_thread(self.get_market_breadth),
+                    self.get_rsp_data(days=60)
+                )
+            else:
+                data = await self.get_rsp_data(days=60)
+            if not data:
+                logger.error("无法获取RSP数据，跳过检查")
+                return
+            
             # 检查是否为新月份
             if self.state['current_month'] != current_month:
                 self.reset_monthly_state(current_month)
-                # 设置月初价格
-                month_start_data = df[pd.to_datetime(df['date']).dt.strftime('%Y-%m') == current_month]
-                if not month_start_data.empty:
-                    self.state['month_start_price'] = float(month_start_data.iloc[0]['open'])
-            
-            # 获取今日数据
-            today_data = df[df['date'] == today]
-            if today_data.empty:
-                # 如果今日数据不可用，使用最近一个交易日的数据
-                latest_data = df.iloc[-1]
-                logger.info(f"今日RSP数据不可用，使用最近交易日数据: {latest_data['date']}")
-                today_close = float(latest_data['close'])
-                today_return = float(latest_data['daily_return']) if not pd.isna(latest_data['daily_return']) else 0
-            else:
-                today_close = float(today_data.iloc[-1]['close'])
-                today_return = float(today_data.iloc[-1]['daily_return']) if not pd.isna(today_data.iloc[-1]['daily_return']) else 0
+                # 设置月初价格：本月第一个交易日的开盘价
+                month_key = (today.year, today.month)
+                month_start_idx = next(
+                    (i for i, d in enumerate(data['date']) if (d.year, d.month) == month_key), None
+                )
+                if month_start_idx is not None:
+                    self.update_state(month_start_price=float(data['open'][month_start_idx]))
+            
+            # 获取今日数据，不可用时使用最近一个交易日的数据
+            dates = data['date']
+            idx = next((i for i in range(len(dates) - 1, -1, -1) if dates[i] == today), None)
+            if idx is None:
+                idx = len(dates) - 1
+                logger.info("今日RSP数据不可用，使用最近交易日数据: %s", dates[idx])
+            today_close = float(data['close'][idx])
+            today_return = float(data['daily_return'][idx]) if not np.isnan(data['daily_return'][idx]) else 0
             
             # 更新月度最低价
             if self.state['month_low_price'] is None:
-                self.state['month_low_price'] = today_close
+                self.update_state(month_low_price=today_close)
             else:
-                self.state['month_low_price'] = min(self.state['month_low_price'], today_close)
+                self.update_state(month_low_price=min(self.state['month_low_price'], today_close))
+            self.update_state(last_close=today_close)
             
             # 计算累计跌幅
             if self.state['month_start_price']:
@@ -268,10 +385,10 @@ class RSPMonitor:
             else:
                 cumulative_decline = 0
             
-            logger.info(f"RSP监控 - 日期: {today}")
-            logger.info(f"收盘价: ${today_close:.2f}")
-            logger.info(f"日收益率: {today_return:.2%}")
-            logger.info(f"月累计跌幅: {cumulative_decline:.2%}")
+            logger.info("RSP监控 - 日期: %s", today)
+            logger.info("收盘价: $%.2f", today_close)
+            logger.info("日收益率: %.2f%%", today_return * 100)
+            logger.info("月累计跌幅: %.2f%%", cumulative_decline * 100)
             
             # 检查触发条件
             messages = []
@@ -291,7 +408,7 @@ class RSPMonitor:
 💡 建议: 执行第一笔定投"""
                 
                 messages.append(msg)
-                self.state['first_dip_triggered'] = True
+                self.update_state(first_dip_triggered=True)
                 logger.info("触发条件1: 日跌幅≥1%")
             
             # 条件2: 第三个周五到期提醒
@@ -309,7 +426,7 @@ class RSPMonitor:
 💡 说明: 当月未触发1%跌幅条件，按计划执行第一笔定投"""
                 
                 messages.append(msg)
-                self.state['monthly_deadline_triggered'] = True
+                self.update_state(monthly_deadline_triggered=True)
                 logger.info("触发条件2: 第三个周五到期提醒")
             
             # 条件3: 累计跌幅≥5%
@@ -327,14 +444,15 @@ class RSPMonitor:
 💡 建议: 执行第二笔定投，增加投资力度"""
                 
                 messages.append(msg)
-                self.state['second_dip_triggered'] = True
-                logger.info(f"触发条件3: 累计跌幅{cumulative_decline:.2%}")
+                self.update_state(second_dip_triggered=True)
+                logger.info("触发条件3: 累计跌幅%.2f%%", cumulative_decline * 100)
             
             # 条件4: 市场宽度<15%
             if (self.state['second_dip_triggered'] and 
                 not self.state['third_dip_triggered']):
                 
-                market_breadth = self.get_market_breadth()
+                if market_breadth is None:
+                    market_breadth = await asyncio.to_thread(self.get_market_breadth)
                 
                 if market_breadth < 15:
                     msg = f"""🔔 RSP定投提醒 - 触发第三笔定投
@@ -348,8 +466,8 @@ class RSPMonitor:
 ⚠️ 市场恐慌情绪加剧，建议执行第三笔定投"""
                     
                     messages.append(msg)
-                    self.state['third_dip_triggered'] = True
-                    logger.info(f"触发条件4: 市场宽度{market_breadth:.1f}%")
+                    self.update_state(third_dip_triggered=True)
+                    logger.info("触发条件4: 市场宽度%.1f%%", market_breadth)
             
             # 发送每日状态报告
             daily_report = f"""📊 RSP每日监控报告
@@ -367,46 +485,80 @@ class RSPMonitor:
 
 {'🔔 今日触发: ' + str(len(messages)) + ' 个提醒' if messages else '😴 今日无触发条件'}"""
             
-            # 发送所有消息
-            self.send_wechat(daily_report)
-            for msg in messages:
-                self.send_wechat(msg)
+            # 触发提醒合并为一条推送（--split-alerts时每个提醒单独推送），与每日报告并发发送
+            if messages and not self.split_alerts:
+                alerts = ["\n\n---\n\n".join(messages)]
+            else:
+                alerts = messages
+            await asyncio.gather(
+                self.send_wechat(daily_report),
+                *(self.send_wechat(msg) for msg in alerts),
+                return_exceptions=True
+            )
             
             # 更新状态
-            self.state['last_check_date'] = today.strftime('%Y-%m-%d')
+            self.update_state(last_check_date=today.strftime('%Y-%m-%d'))
             self.save_state()
             
-            # 输出当前状态
-            print(f"\n📊 RSP监控状态 ({today})")
-            print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
-            print(f"💰 当前价格: ${today_close:.2f}")
-            print(f"📈 日收益率: {today_return:+.2%}")
-            print(f"📉 月累计跌幅: {cumulative_decline:+.2%}")
-            print(f"📅 监控月份: {current_month}")
-            print(f"\n🎯 触发状态:")
-            print(f"   第一笔定投: {'✅已触发' if self.state['first_dip_triggered'] else '⏳等待中'}")
-            print(f"   到期提醒: {'✅已触发' if self.state['monthly_deadline_triggered'] else '⏳等待中'}")
-            print(f"   第二笔定投: {'✅已触发' if self.state['second_dip_triggered'] else '⏳等待中'}")
-            print(f"   第三笔定投: {'✅已触发' if self.state['third_dip_triggered'] else '⏳等待中'}")
-            
-            if messages:
-                print(f"\n🔔 今日触发: {len(messages)} 个提醒")
-            else:
-                print(f"\n😴 今日无触发条件")
+            if not messages:
+                logger.info("今日无触发条件")
+            
+            # 输出当前状态：有触发或指定--verbose时才输出完整状态，--quiet时不输出
+            if not self.quiet and (messages or self.verbose):
+                print(f"\n📊 RSP监控状态 ({today})")
+                print(f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━")
+                print(f"💰 当前价格: ${today_close:.2f}")
+                print(f"📈 日收益率: {today_return:+.2%}")
+                print(f"📉 月累计跌幅: {cumulative_decline:+.2%}")
+                print(f"📅 监控月份: {current_month}")
+                print(f"\n🎯 触发状态:")
+                print(f"   第一笔定投: {'✅已触发' if self.state['first_dip_triggered'] else '⏳等待中'}")
+                print(f"   到期提醒: {'✅已触发' if self.state['monthly_deadline_triggered'] else '⏳等待中'}")
+                print(f"   第二笔定投: {'✅已触发' if self.state['second_dip_triggered'] else '⏳等待中'}")
+                print(f"   第三笔定投: {'✅已触发' if self.state['third_dip_triggered'] else '⏳等待中'}")
+            
+                if messages:
+                    print(f"\n🔔 今日触发: {len(messages)} 个提醒")
+                else:
+                    print(f"\n😴 今日无触发条件")
                 
         except Exception as e:
-            logger.error(f"检查触发条件失败: {e}")
+            logger.error("检查触发条件失败: %s", e)
     
-    async def run_daily_check(self):
-        """执行每日检查"""
+    async def run_daily_check(self, force: bool = False):
+        """执行每日检查（当日已检查过时直接跳过，force为True时强制重新检查）"""
         logger.info("开始执行RSP每日监控检查")
         
-        if not await self.initialize():
-            logger.error("初始化失败，退出监控")
-            return
-        
-        await self.check_triggers()
-        logger.info("RSP每日监控检查完成")
+        lock = None
+        try:
+            if fcntl is not None:
+                lock = open(self.lock_file, 'w')
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.warning("另一个监控实例正在运行，跳过本次运行")
+                    return
+                # 持锁后重新读取状态，避免沿用另一实例写入之前的旧状态
+                self._dirty = False
+                self.state = self.load_state()
+            
+            # 同一天重复运行时不连接行情接口，也不重复推送
+            if not force and self.state.get('last_check_date') == datetime.now().strftime('%Y-%m-%d'):
+                logger.info("今日已完成检查，跳过本次运行")
+                return
+            
+            if not await self.initialize():
+                logger.error("初始化失败，退出监控")
+                return
+            
+            await self.check_triggers()
+            logger.info("RSP每日监控检查完成")
+        finally:
+            await self.aclose()
+            # 释放行情连接（SDK在对象销毁时断开连接），下次检查重新建立
+            self.quote_ctx = None
+            if lock is not None:
+                lock.close()  # 关闭文件即释放锁
 
 # 配置参数
 def setup_config():
@@ -420,23 +572,36 @@ def setup_config():
     
     return SCKEY
 
-async def main():
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='RSP ETF定投监控系统')
+    parser.add_argument('--quiet', action='store_true', help='不在终端输出状态信息，适合定时任务')
+    parser.add_argument('--verbose', action='store_true', help='无触发条件时也输出完整监控状态')
+    parser.add_argument('--split-alerts', action='store_true', help='每个触发提醒单独推送，默认合并为一条')
+    parser.add_argument('--force', action='store_true', help='当日已检查过时仍强制重新检查')
+    return parser.parse_args(argv)
+
+async def main(argv=None):
     """主函数"""
-    print("🎯 RSP ETF定投监控系统")
-    print("=" * 60)
-    print("📊 监控标的: RSP (标普500等权ETF)")
-    print("🔔 提醒方式: Server酱微信推送")
-    print("⏰ 运行频率: 每日检查")
-    print("=" * 60)
+    args = parse_args(argv)
+    
+    if not args.quiet:
+        print("🎯 RSP ETF定投监控系统")
+        print("=" * 60)
+        print("📊 监控标的: RSP (标普500等权ETF)")
+        print("🔔 提醒方式: Server酱微信推送")
+        print("⏰ 运行频率: 每日检查")
+        print("=" * 60)
     
     # 设置配置
     sckey = setup_config()
     
     # 创建监控实例
-    monitor = RSPMonitor(sckey=sckey)
+    monitor = RSPMonitor(sckey=sckey, quiet=args.quiet, verbose=args.verbose,
+                         split_alerts=args.split_alerts)
     
     # 执行每日检查
-    await monitor.run_daily_check()
+    await monitor.run_daily_check(force=args.force)
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
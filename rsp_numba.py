@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# numba可选依赖：已安装时使用njit编译热点循环，未安装时退化为普通Python函数
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """numba未安装时的空装饰器，支持 @njit 和 @njit(...) 两种写法"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator